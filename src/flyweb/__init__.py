@@ -9,6 +9,7 @@ from ._flyweb import (
     MouseEvent,
     UIEvent,
     serialize,
+    serialize_to_json,
 )
 
 # You must install flyweb[server] to include an asgi server.
@@ -30,6 +31,7 @@ __all__ = [
     "KeyboardEvent",
     "MouseEvent",
     "serialize",
+    "serialize_to_json",
     "Server",
     "UIEvent",
 ]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import atexit
 import contextlib
 import dataclasses
+import functools
 import logging
 import pathlib
-import re
 import tempfile
+import threading
 import time
 from collections.abc import Callable, Iterable
 from importlib import resources
@@ -13,12 +15,78 @@ from typing import Any
 
 import anyio
 import socketio
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 
 import flyweb
+from flyweb import _flyweb, _static_files
 
 logger = logging.getLogger("flyweb")
 
 
+class _OrJson:
+    """Subset of "json" module API that socketio uses, implemented with orjson."""
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs) -> str:
+        # socketio passes "separators", but orjson output is always compact.
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def loads(s: str | bytes) -> Any:
+        return orjson.loads(s)
+
+
+# Install flyweb[fast] to encode messages with orjson instead of json.
+try:
+    import orjson
+except ImportError:
+    _JSON = None
+else:
+    _JSON = _OrJson
+
+# Line in index.html that gets replaced with <link> tags for extra CSS.
+_STYLESHEETS_MARKER = "<!-- STYLESHEETS -->"
+
+
+@functools.lru_cache(maxsize=1)
+def _load_index_template() -> tuple[str, str]:
+    """Reads the index.html template once per process.
+
+    Returns the parts of the template before and after the STYLESHEETS line.
+    """
+    template = resources.files(flyweb).joinpath("static/index.html").read_text()
+    prefix, suffix = template.split(_STYLESHEETS_MARKER, 1)
+    # Drop the indentation and any trailing whitespace on the marker line.
+    return prefix.rstrip(" \t"), suffix.lstrip(" \t")
+
+
+# Apps look up the static directory in worker threads. Without this, Apps that
+# are entered at the same time could both extract the files.
+_flyweb_static_dir_lock = threading.Lock()
+
+
+def _get_flyweb_static_dir() -> pathlib.Path:
+    """Returns a directory with flyweb's static files.
+
+    If flyweb is installed as regular files, this is the directory inside the
+    package. Otherwise (e.g. flyweb is in a zip file), the files get extracted
+    to a temporary directory once per process.
+    """
+    with _flyweb_static_dir_lock:
+        return _find_flyweb_static_dir()
+
+
+@functools.lru_cache(maxsize=1)
+def _find_flyweb_static_dir() -> pathlib.Path:
+    static = resources.files(flyweb).joinpath("static")
+    if isinstance(static, pathlib.Path):
+        return static
+    ctx = resources.as_file(static)
+    path = ctx.__enter__()
+    atexit.register(ctx.__exit__, None, None, None)
+    return path
+
+
 @dataclasses.dataclass
 class _DomUpdateMessage:
     """Message that gets sent to frontend at every update."""
@@ -31,6 +99,21 @@ class _DomUpdateMessage:
         return dataclasses.asdict(self)
 
 
+@dataclasses.dataclass
+class _DomPatchMessage:
+    """Message that gets sent to frontends that already have the previous DOM.
+
+    See _flyweb.diff for the patch format.
+    """
+
+    patch: list[list]
+    title: str
+    server_start_time: int
+
+    def serialize(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
 class App:
     """Flyweb ASGI app.
 
@@ -47,19 +130,54 @@ class App:
         # TODO: document that this can be either a string (CSS fragment) or
         # path to a file.
         extra_css: list[str | pathlib.Path] | None = None,
+        # If set, schedule_update() waits this long before rendering, so that
+        # a burst of requests results in a single update.
+        update_debounce_s: float = 0.0,
+        # If set, messages to and from the frontend are encoded with
+        # MessagePack instead of JSON. Requires flyweb[msgpack].
+        binary: bool = False,
     ):
         self._path = path
+        # URL prefixes for socket.io and static files.
+        self._socketio_path = path.removesuffix("/") + "/socket.io"
+        self._static_path = path.removesuffix("/") + "/static"
         self._render_function = render_function
         self._extra_css = extra_css or []
+        self._update_debounce_s = update_debounce_s
+        # index.html only depends on path and extra_css, so render and encode it
+        # once.
+        self._index_html = self._make_index_html(
+            _load_index_template(),
+            [self._css_url(i) for i in range(len(self._extra_css))],
+            scripts=["static/msgpack_parser.js"] if binary else [],
+        ).encode()
 
         self._sio = socketio.AsyncServer(
-            async_mode="asgi", socketio_path=path.removesuffix("/") + "/socket.io"
+            async_mode="asgi",
+            socketio_path=self._socketio_path,
+            serializer="msgpack" if binary else "default",
+            json=_JSON,
         )
         self._sio.on("connect", self._handle_socketio_connect)
+        self._sio.on("disconnect", self._handle_socketio_disconnect)
         self._sio.on("event", self._handle_socketio_event)
+        # Session IDs of connected frontends.
+        self._sessions: set[str] = set()
+        # Maps URL paths to static files. Filled in while the context is
+        # entered, as some of the files live in a temporary directory.
+        self._static_files: dict[str, str] = {}
+        # Static files are served by StaticFilesApp, socketio only needs to
+        # handle socket.io requests.
+        self._asgi_app = _static_files.StaticFilesApp(
+            socketio.ASGIApp(self._sio),
+            static_files=self._static_files,
+            socketio_path=self._socketio_path,
+        )
 
         self._flyweb = flyweb.FlyWeb()
-        self._sio_app = None
+        # Last serialized DOM that was sent to the frontends. Updates to
+        # frontends that have it are sent as patches against it.
+        self._vdom: list[str | dict | list] | None = None
         self._ctx = None
         # Timestamp of when server was started. This gets set to the frontend so that
         # frontend can reload the page if server was restarted, in case any static
@@ -68,9 +186,14 @@ class App:
 
         # Title of the page, updated by FlyWeb.set_title().
         self._title: str = "flyweb"
-        # Wait to initialize it until we are running. Otherwise, this blows up
+        # Wait to initialize these until we are running. Otherwise, this blows up
         # if the object is instantiated before running in async context.
-        self._update_requested: anyio.Event | None = None
+        # Holds at most one pending update request, so that requests that come
+        # in while rendering get coalesced into a single update.
+        self._update_requests: MemoryObjectSendStream[None] | None = None
+        # Held while rendering and sending an update, so that all frontends see
+        # the patches in the same order.
+        self._update_lock: anyio.Lock | None = None
 
     async def __aenter__(self) -> App:
         if self._ctx:
@@ -85,100 +208,165 @@ class App:
         return await ctx.__aexit__(*args, **kwargs)
 
     async def __call__(self, scope, receive, send):
-        if not self._sio_app:
+        if not self._static_files:
             raise RuntimeError("you must enter App's async context")
-        await self._sio_app(scope, receive, send)
+        await self._asgi_app(scope, receive, send)
 
     @contextlib.asynccontextmanager
     async def _make_context(self):
-        with self._make_static_dir() as static_files:
-            self._sio_app = socketio.ASGIApp(
-                self._sio,
-                static_files=static_files,
-            )
-            async with anyio.create_task_group() as tg:
-                tg.start_soon(self._update_task)
-                yield self
-                tg.cancel_scope.cancel()
-        self._sio_app = None
-
-    @contextlib.contextmanager
-    def _make_static_dir(self):
-        index_html_template = (
-            resources.files(flyweb).joinpath("static/index.html").read_text()
-        )
-        # Create a temporary directory. We'll write index.html to it and any
-        # CSS fragments that were passed in as strings.
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = pathlib.Path(tmp_dir)
-            static_files = self._make_css_static_files_map(tmp_path)
+        async with self._make_static_dir() as static_files:
+            self._static_files.update(static_files)
+            self._update_lock = anyio.Lock()
+            send_stream, receive_stream = anyio.create_memory_object_stream(1)
+            self._update_requests = send_stream
+            try:
+                with send_stream:
+                    async with anyio.create_task_group() as tg:
+                        tg.start_soon(self._update_task, receive_stream)
+                        try:
+                            yield self
+                        finally:
+                            # Turn schedule_update() into a no-op before the
+                            # update task closes its end of the stream.
+                            self._update_requests = None
+                        tg.cancel_scope.cancel()
+            finally:
+                self._static_files.clear()
 
-            index_html = self._make_index_html(index_html_template, static_files.keys())
-            (tmp_path / "index.html").write_text(index_html)
+    @contextlib.asynccontextmanager
+    async def _make_static_dir(self):
+        # Create a temporary directory. We'll write index.html to it and any
+        # CSS fragments that were passed in as strings. Filesystem calls are
+        # blocking, so they are done in worker threads, with the files written
+        # in parallel.
+        tmp_dir = await anyio.to_thread.run_sync(tempfile.TemporaryDirectory)
+        try:
+            tmp_path = pathlib.Path(tmp_dir.name)
+            static_files, files_to_write = self._make_css_static_files_map(tmp_path)
+            files_to_write.append((tmp_path / "index.html", self._index_html))
             static_files[self._path] = str(tmp_path / "index.html")
 
-            with resources.as_file(
-                resources.files(flyweb).joinpath("static")
-            ) as flyweb_static_files:
-                static_files[self._path.removesuffix("/") + "/static"] = str(
-                    flyweb_static_files
+            async with anyio.create_task_group() as tg:
+                for path, contents in files_to_write:
+                    tg.start_soon(anyio.to_thread.run_sync, path.write_bytes, contents)
+                flyweb_static_dir = await anyio.to_thread.run_sync(
+                    _get_flyweb_static_dir
                 )
-                yield static_files
+                static_files[self._static_path] = str(flyweb_static_dir)
+            yield static_files
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(tmp_dir.cleanup)
 
-    async def _update_task(self) -> None:
-        self._update_requested = anyio.Event()
-        while True:
-            await self._update_requested.wait()
-            self._update_requested = anyio.Event()
-            await self._update()
+    async def _update_task(self, requests: MemoryObjectReceiveStream[None]) -> None:
+        with requests:
+            async for _ in requests:
+                if self._update_debounce_s:
+                    await anyio.sleep(self._update_debounce_s)
+                    # This update covers requests made while we were sleeping.
+                    with contextlib.suppress(anyio.WouldBlock):
+                        requests.receive_nowait()
+                # If there's nobody to send it to, skip rendering. The next
+                # frontend to connect will trigger a render anyway.
+                if self._sessions:
+                    await self._update()
 
     def _make_css_static_files_map(
         self, tmp_static_path: pathlib.Path
-    ) -> dict[str, str]:
+    ) -> tuple[dict[str, str], list[tuple[pathlib.Path, bytes]]]:
+        """Returns static file mappings and files that need to be written."""
         static_files = {}
+        files_to_write = []
         for i, str_or_path in enumerate(self._extra_css):
-            basename = f"{i}.css"
             if isinstance(str_or_path, pathlib.Path):
                 # extra CSS is a file, add it to static file mappings.
                 path = str_or_path
             else:
                 # extra CSS is a string, write it out to temp file.
-                path = tmp_static_path / basename
-                path.write_text(str_or_path)
-            static_files[self._path.removesuffix("/") + f"/static/{basename}"] = str(
-                path
-            )
-        return static_files
-
-    def _make_index_html(self, template: str, stylesheets: Iterable[str]) -> str:
+                path = tmp_static_path / f"{i}.css"
+                files_to_write.append((path, str_or_path.encode()))
+            static_files[self._css_url(i)] = str(path)
+        return static_files, files_to_write
+
+    def _css_url(self, i: int) -> str:
+        return f"{self._static_path}/{i}.css"
+
+    def _make_index_html(
+        self,
+        template: tuple[str, str],
+        stylesheets: Iterable[str],
+        *,
+        scripts: Iterable[str],
+    ) -> str:
         ss = [f'<link rel="stylesheet" href="{x}">' for x in stylesheets]
-        return re.sub(r"(?m)^\s*<!-- STYLESHEETS -->\s*$", "\n".join(ss), template)
+        # Extra scripts go in the same place, before script.js is loaded.
+        ss += [f'<script src="{x}"></script>' for x in scripts]
+        prefix, suffix = template
+        return prefix + "\n".join(ss) + suffix
 
     def schedule_update(self) -> None:
-        if self._update_requested is not None:
-            self._update_requested.set()
+        """Requests an update without waiting for it.
+
+        Skipped if no frontends are connected.
+        """
+        if self._update_requests is not None:
+            # If an update is already pending, it will pick up this change too.
+            with contextlib.suppress(anyio.WouldBlock):
+                self._update_requests.send_nowait(None)
 
     async def update(self) -> None:
+        """Renders and sends an update, even if no frontends are connected."""
         await self._update()
 
     async def _handle_socketio_connect(self, session_id: str, _) -> None:
-        logger.debug(f'socket "{session_id}" connected')
+        logger.debug('socket "%s" connected', session_id)
+        self._sessions.add(session_id)
         await self._update(session_id=session_id)
 
+    async def _handle_socketio_disconnect(self, session_id: str, *_) -> None:
+        logger.debug('socket "%s" disconnected', session_id)
+        self._sessions.discard(session_id)
+
     async def _update(self, *, session_id: str | None = None) -> None:
-        self._flyweb = flyweb.FlyWeb()
-        self._render_function(self._flyweb)
-        vdom = flyweb.serialize(self._flyweb)
-        if self._flyweb._title is not None:
-            self._title = self._flyweb._title
-        msg = _DomUpdateMessage(
-            vdom=vdom, title=self._title, server_start_time=self._server_start_time
-        )
-        await self._sio.emit("update", msg.serialize(), to=session_id)
+        """Renders and sends the DOM to frontends.
+
+        If session_id is given, that frontend gets the full DOM, and the rest
+        get a patch. Otherwise all frontends get a patch.
+        """
+        if self._update_lock is None:
+            raise RuntimeError("you must enter App's async context")
+        async with self._update_lock:
+            self._flyweb.reset()
+            self._render_function(self._flyweb)
+            vdom = flyweb.serialize(self._flyweb)
+            prev_title = self._title
+            if self._flyweb._title is not None:
+                self._title = self._flyweb._title
+            prev_vdom, self._vdom = self._vdom, vdom
+
+            if prev_vdom is not None:
+                patch = _flyweb.diff(prev_vdom, vdom)
+                # Don't bother the frontends if nothing changed.
+                if patch or self._title != prev_title:
+                    patch_msg = _DomPatchMessage(
+                        patch=patch,
+                        title=self._title,
+                        server_start_time=self._server_start_time,
+                    )
+                    await self._sio.emit(
+                        "patch", patch_msg.serialize(), skip_sid=session_id
+                    )
+            if prev_vdom is None or session_id is not None:
+                msg = _DomUpdateMessage(
+                    vdom=vdom,
+                    title=self._title,
+                    server_start_time=self._server_start_time,
+                )
+                await self._sio.emit("update", msg.serialize(), to=session_id)
 
     async def _handle_socketio_event(self, _, msg) -> None:
-        if not isinstance(msg, dict):
-            logger.error(f"got unexpected message type: {type(msg).__name__}")
+        if type(msg) is not dict:
+            logger.error("got unexpected message type: %s", type(msg).__name__)
             return
 
         if self._flyweb._handle_event_from_frontend(msg):
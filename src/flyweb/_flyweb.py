@@ -2,18 +2,26 @@
 
 from __future__ import annotations
 
-import collections
-import contextlib
 import dataclasses
+import functools
 import inspect
+import json
 import logging
 import time
+import types
 import typing
+import weakref
 from collections.abc import Callable
 from typing import Any, Protocol, TypedDict
 
 from typing_extensions import Unpack
 
+# Install flyweb[fast] to make serialize_to_json faster.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger("flyweb")
 
 
@@ -176,7 +184,7 @@ class DomNodeProperties(TypedDict, total=False):
     # TODO: add the rest of event handlers and properties as needed.
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class DomNode:
     tag: str
     children: list[str | DomNode] = dataclasses.field(default_factory=list)
@@ -190,8 +198,27 @@ def _serialize(x: str | DomNode) -> str | list[str | list | dict]:
     if isinstance(x, str):
         return x
     assert isinstance(x, DomNode)
-    children = [_serialize(x) for x in x.children]
-    return [x.tag, x.props, children]
+    # Walk the tree with an explicit stack, so that deep trees don't hit the
+    # recursion limit. Each node's output gets added to its parent's children
+    # right away, and its own children list gets filled in when it's popped.
+    children: list = []
+    out = [x.tag, x.props, children]
+    stack = [(x, children)]
+    while stack:
+        node, children = stack.pop()
+        for child in node.children:
+            # Children are either DomNodes or strings. Plain strings are by far
+            # the most common, and comparing the class is cheaper than
+            # isinstance.
+            if child.__class__ is str:
+                children.append(child)
+            elif isinstance(child, DomNode):
+                child_children: list = []
+                children.append([child.tag, child.props, child_children])
+                stack.append((child, child_children))
+            else:
+                children.append(child)
+    return out
 
 
 def serialize(f: FlyWeb) -> list[str | list | dict]:
@@ -200,15 +227,240 @@ def serialize(f: FlyWeb) -> list[str | list | dict]:
     return serialized
 
 
-@dataclasses.dataclass
+def serialize_to_json(f: FlyWeb) -> bytes:
+    """Returns the same as serialize(f), encoded as JSON.
+
+    With orjson installed, the DOM is encoded straight from the DomNode tree,
+    without building the serialized lists first.
+    """
+    if orjson is not None:
+        try:
+            # DomNode is a dataclass, which orjson would encode as an object.
+            return orjson.dumps(
+                f._root,
+                default=_node_to_json,
+                option=orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            # orjson limits how deeply "default" can nest.
+            pass
+    return json.dumps(serialize(f), separators=(",", ":")).encode()
+
+
+def _node_to_json(x: Any) -> list:
+    if isinstance(x, DomNode):
+        return [x.tag, x.props, x.children]
+    raise TypeError(f"can't serialize {x.__class__.__name__}")
+
+
+def diff(old: str | list, new: str | list) -> list[list]:
+    """Returns a list of operations that turn serialized DOM "old" into "new".
+
+    Nodes are addressed by a path of child indices from the root. Operations:
+    * ["replace", path, node]: replace the node at path.
+    * ["props", path, props]: replace props of the node at path.
+    * ["splice", path, start, delete_count, nodes]: splice children of the
+      node at path, like JavaScript's Array.splice.
+
+    Operations have to be applied in order.
+    """
+    patch = []
+    _diff(old, new, [], patch)
+    return patch
+
+
+def _diff(old: str | list, new: str | list, path: list[int], patch: list) -> None:
+    if old == new:
+        return
+    if isinstance(old, str) or isinstance(new, str) or old[0] != new[0]:
+        patch.append(["replace", path, new])
+        return
+    _, old_props, old_children = old
+    _, new_props, new_children = new
+    if old_props != new_props:
+        patch.append(["props", path, new_props])
+
+    # Skip over unchanged children at both ends.
+    max_common = min(len(old_children), len(new_children))
+    start = 0
+    while start < max_common and old_children[start] == new_children[start]:
+        start += 1
+    end = 0
+    while end < max_common - start and old_children[-1 - end] == new_children[-1 - end]:
+        end += 1
+    old_end = len(old_children) - end
+    new_end = len(new_children) - end
+
+    # Diff children that are present in both, then add or remove the rest.
+    paired = min(old_end, new_end) - start
+    for i in range(start, start + paired):
+        _diff(old_children[i], new_children[i], path + [i], patch)
+    splice_start = start + paired
+    if splice_start < old_end or splice_start < new_end:
+        patch.append(
+            [
+                "splice",
+                path,
+                splice_start,
+                old_end - splice_start,
+                new_children[splice_start:new_end],
+            ]
+        )
+
+
+@functools.cache
+def _get_type_hints(type_class: Any) -> dict[str, Any]:
+    """Cached typing.get_type_hints. The returned dict must not be modified."""
+    return typing.get_type_hints(type_class)
+
+
+# Maps code objects of event handlers to their argument annotation. Keyed by
+# code rather than by function, as handlers are often lambdas or closures that
+# get created anew at every render.
+_handler_arg_cache: dict[Any, Any] = {}
+# Same, for handlers that can't be keyed by code. Entries go away along with
+# the handler.
+_handler_arg_weak_cache: weakref.WeakKeyDictionary[Any, Any] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_handler_arg(handler: Callable) -> Any:
+    """Returns annotated type of handler's argument, or None."""
+    func = getattr(handler, "__func__", handler)  # unwrap bound methods
+    code = getattr(func, "__code__", None)
+    # Decorated functions share the wrapper's code, but carry the annotations
+    # of whatever they wrap, so they can't be cached by code.
+    if code is not None and not hasattr(func, "__wrapped__"):
+        cache, key = _handler_arg_cache, code
+    else:
+        cache, key = _handler_arg_weak_cache, func
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # Not hashable or can't be weakly referenced.
+        return _eval_handler_arg(func)
+    arg = cache[key] = _eval_handler_arg(func)
+    return arg
+
+
+def _eval_handler_arg(handler: Callable) -> Any:
+    args_annots = inspect.get_annotations(handler, eval_str=True)
+    # args_annots is a dict with optional "return" key, and keys for args.
+    args_annots.pop("return", None)
+    if len(args_annots) > 1:
+        raise RuntimeError(f'event handler "{handler}" has more than 1 arg')
+    if args_annots:
+        _, arg = args_annots.popitem()
+        return arg
+    return None
+
+
+@functools.cache
+def _get_dict_handler_arg(type_class: Any) -> Any:
+    """Returns handler argument type if type_class is dict[str, <handler>]."""
+    if typing.get_origin(type_class) is not dict:
+        return None
+    args = typing.get_args(type_class)
+    # args is [class 'str', typing.Callable[[...], ...]]
+    assert len(args) == 2
+    assert isinstance(args[1], typing.Callable)
+
+    args = typing.get_args(args[1])
+    # args is [[<args>], <return value>]
+    assert len(args) == 2
+    input_types, _ = args
+    assert len(input_types) == 1
+    return input_types[0]
+
+
+# Maps event handler argument types to what the frontend should pass to them.
+_EVENT_HANDLER_TYPES: dict[Any, str] = {
+    None: "no_args",
+    Event: "event",
+    MouseEvent: "mouse_event",
+    FocusEvent: "focus_event",
+    KeyboardEvent: "keyboard_event",
+}
+
+# Props values for event handlers that are looked up by target id, shared
+# between all nodes. They are tuples, so they can't be modified by accident.
+_EVENT_HANDLER_MARKERS = {t: (_EVENT_HANDLER, t) for t in _EVENT_HANDLER_TYPES.values()}
+
+
+def _get_scalar_props() -> frozenset[str]:
+    """Returns names of DomNodeProperties that only take plain values."""
+    scalar_types = {str, int, bool, ForceValue}
+    names = {"class", "is"}  # class_ and is_ get renamed before fix-up
+    for name, hint in typing.get_type_hints(DomNodeProperties).items():
+        if isinstance(hint, types.UnionType):
+            hint_types = typing.get_args(hint)
+        else:
+            hint_types = (hint,)
+        if all(t in scalar_types for t in hint_types):
+            names.add(name)
+    return frozenset(names)
+
+
+# Props that never need _fix_up_callables. Checking keys against this is
+# cheaper than looking at every value. Other names, including ones that are
+# not in DomNodeProperties, still get their values checked.
+_SCALAR_PROPS = _get_scalar_props()
+
+
+# Shared by all nodes that were created without props, so that they don't
+# each need an empty dict. Must not be modified.
+_NO_PROPS: dict[str, Any] = {}
+
+
+def _needs_fix_up(d: dict[str, Any]) -> bool:
+    """Returns True if FlyWeb._fix_up_callables would change anything in d."""
+    for value in d.values():
+        if value.__class__ is str:
+            continue
+        if callable(value) or isinstance(value, (dict, FrontendFunction)):
+            return True
+    return False
+
+
+@dataclasses.dataclass(slots=True)
 class _DomNodeContext:
-    path: list[str]
-    children_ids: collections.Counter[str] = dataclasses.field(
-        default_factory=collections.Counter
-    )
+    path: tuple[str, ...]
+    # Number of children seen so far, by path component.
+    children_ids: dict[str, int] = dataclasses.field(default_factory=dict)
     children_keys: set[str | int] = dataclasses.field(default_factory=set)
 
 
+class _DomNodeContextManager:
+    """Makes elements created inside "with" block children of node.
+
+    Returned by every FlyWeb.elem() call, but most elements never get
+    entered, so this is kept cheaper to create than a generator-based
+    context manager, and the child context is only created on entry.
+    """
+
+    __slots__ = ("_flyweb", "_node", "_path", "_prev_node", "_prev_ctx")
+
+    def __init__(self, flyweb: FlyWeb, node: DomNode, path: tuple[str, ...]):
+        self._flyweb = flyweb
+        self._node = node
+        self._path = path
+
+    def __enter__(self) -> None:
+        f = self._flyweb
+        self._prev_node = f._node
+        self._prev_ctx = f._ctx
+        f._node = self._node
+        f._ctx = _DomNodeContext(self._path)
+
+    def __exit__(self, *exc_info) -> None:
+        f = self._flyweb
+        f._node = self._prev_node
+        f._ctx = self._prev_ctx
+
+
 class _Renderable(Protocol):
     """Protocol for things that implement "render" method."""
 
@@ -219,54 +471,62 @@ class FlyWeb:
     def __init__(self):
         self._root = DomNode(tag="div")
         self._node: DomNode = self._root
-        self._ctx = _DomNodeContext(path=["flyweb"])
+        self._ctx = _DomNodeContext(path=("flyweb",))
         # Page title: if not None, the title will be updated to given value.
         self._title: str | None = None
 
         self._event_handlers: dict[str, EventFunction] = {}
 
-    @contextlib.contextmanager
-    def _dom_node_context(self, node: DomNode, path: list[str]):
-        prev_node = self._node
-        prev_ctx = self._ctx
-        self._node = node
-        self._ctx = _DomNodeContext(path)
-        try:
-            yield
-        finally:
-            self._node = prev_node
-            self._ctx = prev_ctx
+    def reset(self) -> None:
+        """Clears everything that was rendered, so the object can be reused."""
+        # Serialized output doesn't reference the root's children list, so it
+        # is safe to clear it in place.
+        self._root.children.clear()
+        self._node = self._root
+        self._ctx = _DomNodeContext(path=("flyweb",))
+        self._title = None
+        self._event_handlers.clear()
 
     def _fix_up_callables(
         self,
         d: dict[str, Any],
-        path: list[str],
+        default_id: str,
         *,
         use_handler_key: bool = False,
-        type_class: type[DomNodeProperties] | dict[str, Any] | None,
+        # DomNodeProperties, or the annotation of a nested dict prop. Typed as
+        # Any, as it gets passed to functools.cache'd helpers, which need
+        # hashable arguments.
+        type_class: Any,
     ) -> None:
         if not d:
             return
-        if "id" in d:
-            id_ = d.get("id")
-        else:
-            id_ = "/".join(path)
+        id_ = d.get("id", default_id)
+        # Handler keys are all built from this.
+        id_prefix = f"{id_}/"
         id_needed = False
 
         for name, value in d.items():
+            if value.__class__ is str:
+                # Most props are strings, which need no fixing up.
+                continue
             if isinstance(value, FrontendFunction):
                 d[name] = (_EVAL, value.js)
                 continue
             elif isinstance(value, dict):
+                # Copy the caller's dict: it might be shared, and even if we
+                # don't modify it, App keeps the serialized DOM to diff the
+                # next render against, so it must not change afterwards.
                 d[name] = value.copy()
+                if not _needs_fix_up(value):
+                    continue
                 if type_class:
-                    value_annots = typing.get_type_hints(type_class).get(name)
+                    value_annots = _get_type_hints(type_class).get(name)
                     child_type_class = value_annots
                 else:
                     child_type_class = None
                 self._fix_up_callables(
                     d[name],
-                    path + [name],
+                    f"{default_id}/{name}",
                     use_handler_key=True,
                     type_class=child_type_class,
                 )
@@ -280,32 +540,9 @@ class FlyWeb:
             #
             # TODO: this could use some comments and unittesting.
 
-            args_annots = inspect.get_annotations(value, eval_str=True)
-            # value_annots is a dict with optional "return" key, and keys
-            args_annots.pop("return", None)
-            if len(args_annots) > 1:
-                raise RuntimeError(f'event handler "{value}" has more than 1 arg')
-            if args_annots:
-                _, arg = args_annots.popitem()
-            else:
-                arg = None
-
-            annot_arg = None
-            if type_class:
-                if typing.get_origin(type_class) is dict:
-                    args = typing.get_args(type_class)
-                    # args is [class 'str', typing.Callable[[...], ...]]
-                    assert len(args) == 2
-                    assert isinstance(args[1], typing.Callable)
-
-                    args = typing.get_args(args[1])
-                    # args is [[<args>], <return value>]
-                    assert len(args) == 2
-                    input_types, _ = args
-                    assert len(input_types) == 1
-
-                    annot_arg = input_types[0]
+            arg = _get_handler_arg(value)
 
+            annot_arg = _get_dict_handler_arg(type_class) if type_class else None
             if arg and annot_arg:
                 if arg is not annot_arg:
                     # TODO: clean this up and make the error messages better.
@@ -314,33 +551,26 @@ class FlyWeb:
             if not arg:
                 arg = annot_arg
 
-            if not arg:
-                event_handler_type = "no_args"
-            elif arg is Event:
-                event_handler_type = "event"
-            elif arg is MouseEvent:
-                event_handler_type = "mouse_event"
-            elif arg is FocusEvent:
-                event_handler_type = "focus_event"
-            elif arg is KeyboardEvent:
-                event_handler_type = "keyboard_event"
-            else:
+            event_handler_type = _EVENT_HANDLER_TYPES.get(arg)
+            if event_handler_type is None:
+                arg_name = getattr(arg, "__name__", repr(arg))
                 raise RuntimeError(
-                    f'event handler "{callable}" has'
-                    f' unsupported arg type "{arg.__name__}"'
+                    f'event handler "{value}" has unsupported arg type "{arg_name}"'
                 )
-            handler_key = f"{id_}/{name}"
+            handler_key = id_prefix + name
             self._event_handlers[handler_key] = value
             if use_handler_key:
-                d[name] = [_EVENT_HANDLER, event_handler_type, handler_key]
+                d[name] = (_EVENT_HANDLER, event_handler_type, handler_key)
             else:
                 # We'll look up event by target id + "on" + event type.
-                d[name] = [_EVENT_HANDLER, event_handler_type]
+                d[name] = _EVENT_HANDLER_MARKERS[event_handler_type]
                 id_needed = True
         if id_needed:
             d["id"] = id_
 
-    def _fix_up_props(self, node_props: DomNodeProperties, path: list[str]) -> dict:
+    def _fix_up_props(
+        self, node_props: DomNodeProperties, path: tuple[str, ...]
+    ) -> dict:
         props = typing.cast(dict, node_props)
         if "class_" in props:
             props["class"] = props.pop("class_")
@@ -349,17 +579,20 @@ class FlyWeb:
         if "value" in props and isinstance(props["value"], ForceValue):
             props["value"] = props["value"].serialize()
 
-        self._fix_up_callables(props, path, type_class=DomNodeProperties)
+        # Most nodes have neither event handlers nor nested props, so don't
+        # bother walking their props.
+        if not _SCALAR_PROPS.issuperset(props) and _needs_fix_up(props):
+            self._fix_up_callables(props, "/".join(path), type_class=DomNodeProperties)
         return props
 
     def _handle_event_from_frontend(self, msg: dict[str, Any]) -> bool:
         """Handles event, returns True iff there was an event handler."""
-        logger.debug(f"event: {msg}")
+        logger.debug("event: %s", msg)
         if "target_id" not in msg:
-            logger.warning(f'missing "target_id" in event "{msg}"')
+            logger.warning('missing "target_id" in event "%s"', msg)
             return False
         if "type" not in msg:
-            logger.warning(f'missing "type" in event "{msg}"')
+            logger.warning('missing "type" in event "%s"', msg)
             return False
 
         handler_key = msg.get("_flyweb_handler_key")
@@ -367,11 +600,11 @@ class FlyWeb:
             handler_key = msg["target_id"] + "/" + "on" + msg["type"]
         handler = self._event_handlers.get(handler_key)
         if not handler:
-            logger.warning(f"handler {handler_key} not found")
+            logger.warning("handler %s not found", handler_key)
             return False
 
         # TODO: support async event handlers.
-        logger.debug(f'handling event for "{handler_key}"')
+        logger.debug('handling event for "%s"', handler_key)
         # TODO: validate that msg contains the right keys.
         handler(msg)  # type: ignore
         return True
@@ -380,16 +613,14 @@ class FlyWeb:
         self._title = title
 
     def text(self, txt: str) -> None:
-        if not self._node.children:
-            self._node.children = []
         self._node.children.append(txt)
 
     def _make_child_path(
         self, *, tag: str, id: str | None, key: int | str | None, type_: str | None
-    ) -> list[str]:
+    ) -> tuple[str, ...]:
         # If "id" is given, just use that.
         if id:
-            return [id]
+            return (id,)
         p = tag
         if key is not None:
             if key in self._ctx.children_keys:
@@ -399,11 +630,14 @@ class FlyWeb:
         else:
             if type_:
                 p += f"[{type_}]"
-            count = self._ctx.children_ids.get(p)
-            self._ctx.children_ids[p] += 1
+            children_ids = self._ctx.children_ids
+            count = children_ids.get(p, 0)
+            children_ids[p] = count + 1
             if count:
                 p += f"[{count}]"
-        return self._ctx.path + [p]
+        # Paths are tuples: they are shared with child contexts, and
+        # concatenating tuples is cheaper than lists.
+        return self._ctx.path + (p,)
 
     def elem(
         self, tag: str, *children: str | DomNode, **props: Unpack[DomNodeProperties]
@@ -413,19 +647,20 @@ class FlyWeb:
         )
 
         for c in children:
-            if not isinstance(c, str | DomNode):
+            # Check for plain strings first, as that's by far the most common.
+            if c.__class__ is not str and not isinstance(c, (str, DomNode)):
                 raise TypeError(f"unexpected type for {path}: {c.__class__.__name__}")
 
-        fixed_props = self._fix_up_props(props, path)
+        fixed_props = self._fix_up_props(props, path) if props else _NO_PROPS
 
         node = DomNode(
             tag=tag,
-            children=list(children) if children else [],
-            props=fixed_props or {},
+            children=list(children),
+            props=fixed_props,
         )
         self._node.children.append(node)
 
-        return self._dom_node_context(node, path)
+        return _DomNodeContextManager(self, node, path)
 
     def add(self, renderable: _Renderable) -> None:
         renderable.render(self)
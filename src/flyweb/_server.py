@@ -4,6 +4,7 @@ from collections.abc import Callable
 import anyio
 import hypercorn
 import hypercorn.asyncio
+import hypercorn.config
 
 import flyweb
 
@@ -22,22 +23,22 @@ class Server:
         port: int = 8000,
         **kwargs,
     ):
-        self._port = port
         self._app = flyweb.App("/", render_function, **kwargs)
 
-    async def run(self, *, task_status=anyio.TASK_STATUS_IGNORED) -> None:
         cfg = hypercorn.config.Config()
-        cfg.bind = f"0.0.0.0:{self._port}"
+        cfg.bind = f"0.0.0.0:{port}"
         cfg.accesslog = logging.getLogger("hypercorn.accesslog")
         cfg.access_log_format = '%(h)s "%(R)s" %(s)s %(b)s "%(f)s" "%(a)s"'
         cfg.errorlog = logging.getLogger("hypercorn.errorlog")
         # Don't wait too long for connections to close, as it seems to keep waiting for
         # websocket connections forever.
         cfg.graceful_timeout = 0.5  # seconds
+        self._cfg = cfg
 
+    async def run(self, *, task_status=anyio.TASK_STATUS_IGNORED) -> None:
         event = anyio.Event()
         async with anyio.create_task_group() as tg:
-            await tg.start(self._serve, cfg, event)
+            await tg.start(self._serve, self._cfg, event)
             task_status.started()
             try:
                 await anyio.sleep_forever()
@@ -0,0 +1,92 @@
+import os
+import stat
+
+import anyio
+from engineio.static_files import get_static_file
+
+_PATHSEND = "http.response.pathsend"
+_ZEROCOPYSEND = "http.response.zerocopysend"
+
+# Files are sent in chunks of this size if the server doesn't support any of
+# the extensions above.
+_CHUNK_SIZE = 64 * 1024
+
+
+class StaticFilesApp:
+    """ASGI app that serves static files, passing everything else on to app.
+
+    If the ASGI server supports the "http.response.pathsend" or
+    "http.response.zerocopysend" extension, static files are handed to the
+    server, which can then use sendfile() or similar. Otherwise, they are read
+    and sent in large chunks. Filesystem calls are done in worker threads, so
+    that a slow disk doesn't block the event loop.
+
+    static_files uses the same format as socketio.ASGIApp's static_files.
+    """
+
+    def __init__(self, app, *, static_files: dict[str, str], socketio_path: str):
+        self._app = app
+        self._static_files = static_files
+        self._socketio_path = socketio_path.removesuffix("/") + "/"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            static_file = await self._get_static_file(scope["path"])
+            if static_file:
+                extensions = scope.get("extensions") or {}
+                head = scope.get("method") == "HEAD"
+                await self._serve(*static_file, extensions, head, receive, send)
+                return
+        await self._app(scope, receive, send)
+
+    async def _get_static_file(self, path: str) -> tuple[str, str, int] | None:
+        """Returns filename, content type and size of the file at path."""
+        # Socket.io requests are not static files, even though "/" might match.
+        if (path.removesuffix("/") + "/").startswith(self._socketio_path):
+            return None
+        static_file = get_static_file(path, self._static_files)
+        if not static_file:
+            return None
+        filename = os.path.abspath(static_file["filename"])
+        try:
+            st = await anyio.Path(filename).stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return filename, static_file["content_type"], st.st_size
+
+    async def _serve(
+        self, filename, content_type, size, extensions, head, receive, send
+    ) -> None:
+        event = await receive()
+        if event["type"] != "http.request":
+            return
+        headers = [
+            (b"Content-Type", content_type.encode()),
+            (b"Content-Length", str(size).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        if head:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if _PATHSEND in extensions:
+            await send({"type": _PATHSEND, "path": filename})
+            return
+        async with await anyio.open_file(filename, "rb") as f:
+            if _ZEROCOPYSEND in extensions:
+                await send({"type": _ZEROCOPYSEND, "file": f.wrapped})
+                return
+            while True:
+                chunk = await f.read(_CHUNK_SIZE)
+                size -= len(chunk)
+                more_body = bool(chunk) and size > 0
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": more_body,
+                    }
+                )
+                if not more_body:
+                    break
@@ -20,6 +20,8 @@ class Component:
     _props.
     """
 
+    __slots__ = ("_tag", "_props")
+
     def __init__(self, tag: str, **props: Unpack[_flyweb.DomNodeProperties]):
         self._tag = tag
         self._props = props
@@ -55,6 +57,8 @@ class TextInput(Component):
     * clear_on_escape=True: if <escape> is pressed, clears out the value
     """
 
+    __slots__ = ("_original_onblur", "_individual_key_down_handlers")
+
     def __init__(
         self,
         *,
@@ -64,7 +68,6 @@ class TextInput(Component):
         clear_on_escape: bool = False,
         **props: Unpack[_flyweb.DomNodeProperties],
     ):
-        props = props.copy()
         props.setdefault("value", "")
         self._original_onblur = props.get("onblur")
         props["onblur"] = self._handle_on_blur
@@ -94,11 +97,10 @@ class TextInput(Component):
             self._individual_key_down_handlers = individual_key_down_handlers
             if "_flyweb" not in props:
                 props["_flyweb"] = {}
-            props["_flyweb"]["individualKeyDownHandlers"] = {
-                # TODO: I believe this loses annotations. Review and add tests.
-                k: functools.partial(self._handle_individual_key, v)
-                for k, v in individual_key_down_handlers.items()
-            }
+            # All keys share one handler, which dispatches on the event's key.
+            props["_flyweb"]["individualKeyDownHandlers"] = dict.fromkeys(
+                individual_key_down_handlers, self._handle_individual_key
+            )
         else:
             self._individual_key_down_handlers = None
         super().__init__("input", **props)
@@ -126,12 +128,11 @@ class TextInput(Component):
     def _handle_on_escape(self, _: _flyweb.KeyboardEvent) -> None:
         self.value = _flyweb.ForceValue("")
 
-    def _handle_individual_key(
-        self, orig_handler: _flyweb.KeyboardEventFunction, event: _flyweb.KeyboardEvent
-    ) -> None:
+    def _handle_individual_key(self, event: _flyweb.KeyboardEvent) -> None:
+        assert self._individual_key_down_handlers
         if "target_value" in event:
             self.value = event["target_value"]
-        orig_handler(event)
+        self._individual_key_down_handlers[event["key"]](event)
 
     def _handle_on_blur(self, event: _flyweb.FocusEvent) -> None:
         if "target_value" in event:
@@ -141,11 +142,12 @@ class TextInput(Component):
 
 
 class CheckBox(Component):
+    __slots__ = ("_original_onclick", "checked")
+
     def __init__(
         self,
         **props: Unpack[_flyweb.DomNodeProperties],
     ):
-        props = props.copy()
         self._original_onclick = props.pop("onclick", None)
         props["onclick"] = self._handle_on_click
         props["type"] = "checkbox"
@@ -154,7 +156,7 @@ class CheckBox(Component):
         self.checked = props.setdefault("checked", False)
 
     def render(self, w: _flyweb.FlyWeb) -> None:
-        self.props["checked"] = self.checked
+        self._props["checked"] = self.checked
         super().render(w)
 
     def _handle_on_click(self, event: _flyweb.MouseEvent) -> None:
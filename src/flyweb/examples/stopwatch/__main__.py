@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
-import datetime
 import logging
 import sys
+import time
 
 import anyio
 import flyweb
@@ -16,50 +16,66 @@ except ImportError:
 class Stopwatch:
     """Example of a server-side stopwatch."""
 
+    __slots__ = ("_elapsed_ns", "_start_ns", "_running")
+
     def __init__(self):
-        self._elapsed = datetime.timedelta()
+        # Times are from time.monotonic_ns(), so that they are not affected by
+        # changes to the system clock.
+        self._elapsed_ns = 0
         # If stopwatch is running, this contains the time it was last started.
-        self._start_time = None
+        self._start_ns: int | None = None
+        # Set while the stopwatch is running.
+        self._running = anyio.Event()
+
+    async def wait_running(self) -> None:
+        await self._running.wait()
 
     def _make_elapsed_string(self) -> str:
-        seconds = self._elapsed.total_seconds()
-        milliseconds = int(seconds * 1000) % 1000
-        minutes = int(seconds) // 60
-        seconds = int(seconds) % 60
+        seconds, milliseconds = divmod(self._elapsed_ns // 1_000_000, 1000)
+        minutes, seconds = divmod(seconds, 60)
         return f"{minutes:02}:{seconds:02}.{milliseconds:03}"
 
     def _on_reset(self, _) -> None:
-        self._elapsed = datetime.timedelta()
-        self._start_time = None
+        self._elapsed_ns = 0
+        self._set_stopped()
 
     def _on_start(self, _) -> None:
-        self._start_time = datetime.datetime.now()
+        self._start_ns = time.monotonic_ns()
+        self._running.set()
 
     def _on_stop(self, _) -> None:
-        if not self._start_time:
+        if self._start_ns is None:
             return
-        self._elapsed += datetime.datetime.now() - self._start_time
-        self._start_time = None
+        self._elapsed_ns += time.monotonic_ns() - self._start_ns
+        self._set_stopped()
+
+    def _set_stopped(self) -> None:
+        self._start_ns = None
+        if self._running.is_set():
+            self._running = anyio.Event()
 
     def render(self, w: flyweb.FlyWeb) -> None:
-        if self._start_time:
-            self._elapsed += datetime.datetime.now() - self._start_time
-            self._start_time = datetime.datetime.now()
+        if self._start_ns is not None:
+            now = time.monotonic_ns()
+            self._elapsed_ns += now - self._start_ns
+            self._start_ns = now
 
         with w.div():
-            w.text("Elapsed: ")
-            w.text(self._make_elapsed_string())
+            w.text(f"Elapsed: {self._make_elapsed_string()}")
 
         with w.div():
             w.button("RESET", key="reset", onclick=self._on_reset)
-            if not self._start_time:
+            if self._start_ns is None:
                 w.button("START", key="start", onclick=self._on_start)
             else:
                 w.button("STOP", key="stop", onclick=self._on_stop)
 
 
-async def _update_task(server: flyweb.Server) -> None:
+async def _update_task(server: flyweb.Server, stopwatch: Stopwatch) -> None:
     while True:
+        # Nothing changes while the stopwatch is stopped. Button clicks update
+        # the page by themselves.
+        await stopwatch.wait_running()
         server.schedule_update()
         await anyio.sleep(0.25)
 
@@ -69,7 +85,7 @@ async def main():
     server = flyweb.Server(stopwatch.render, port=8000)
 
     async with anyio.create_task_group() as tg:
-        tg.start_soon(_update_task, server)
+        tg.start_soon(_update_task, server, stopwatch)
         await server.run()
 
 
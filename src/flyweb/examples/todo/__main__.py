@@ -27,6 +27,8 @@ h1 {
 class TodoList:
     """Example todo list application."""
 
+    __slots__ = ("_items", "_add", "_next_id")
+
     def __init__(self):
         self._items = {
             1: TodoItem(id=1, title="write code", completed=True, parent=self),
@@ -71,40 +73,47 @@ class TodoList:
 
 
 class TodoItem:
+    __slots__ = ("id", "title", "parent", "_completed", "_editor", "_editing")
+
     def __init__(self, *, id: int, title: str, parent: TodoList, completed=False):
         self.id = id
         self.title = title
         self.parent = parent
         self._completed = components.CheckBox(key="checkbox", checked=completed)
-        self._editing: components.TextInput | None = None
+        # Text input for editing the title. Created when first needed, then
+        # reused for later edits.
+        self._editor: components.TextInput | None = None
+        self._editing = False
 
     def render(self, w: flyweb.FlyWeb):
         with w.li(key=self.id):
             with w.div():
                 with w.label():
                     self._completed.render(w)
-                    if self._editing:
-                        self._editing.render(w)
+                    if self._editing and self._editor:
+                        self._editor.render(w)
                     else:
                         w.text(self.title)
                     w.elem("button", "edit", onclick=self._on_edit_clicked)
                     w.elem("button", "delete", onclick=self._on_delete_clicked)
 
     def _on_edit_clicked(self, _) -> None:
-        self._editing = components.TextInput(
-            key="edit",
-            value=self.title,
-            onblur=self._on_blur,
-            on_enter=self._replace_title,
-            # "afterCreate" is a maquette hook that gets called when the
-            # element gets attached to the real DOM.
-            # TODO: flesh out a more detailed example.
-            afterCreate=flyweb.FrontendFunction("function(el) { el.focus(); }"),
-        )
+        if self._editor is None:
+            self._editor = components.TextInput(
+                key="edit",
+                onblur=self._on_blur,
+                on_enter=self._replace_title,
+                # "afterCreate" is a maquette hook that gets called when the
+                # element gets attached to the real DOM.
+                # TODO: flesh out a more detailed example.
+                afterCreate=flyweb.FrontendFunction("function(el) { el.focus(); }"),
+            )
+        self._editor.value = self.title
+        self._editing = True
 
     def _replace_title(self, new_title: str) -> None:
         self.title = new_title
-        self._editing = None
+        self._editing = False
 
     def _on_blur(self, event: flyweb.Event) -> None:
         if "target_value" in event:
@@ -112,7 +121,7 @@ class TodoItem:
 
     def _on_enter_key(self, value: str) -> None:
         self.title = value
-        self._editing = None
+        self._editing = False
 
     def _on_delete_clicked(self, ev: flyweb.MouseEvent) -> None:
         self.parent.delete_todo(self.id)
@@ -0,0 +1,297 @@
+// Socket.IO parser that encodes packets with MessagePack. This is the frontend
+// side of python-socketio's serializer="msgpack", used when App is created with
+// binary=True. Pass it to io() as the "parser" option.
+
+var flywebMsgpackParser = (() => {
+  const textEncoder = new TextEncoder();
+  const textDecoder = new TextDecoder();
+
+  function toUint8Array(data) {
+    if (data instanceof ArrayBuffer) {
+      return new Uint8Array(data);
+    }
+    return new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+  }
+
+  function encode(value) {
+    const chunks = [];
+    let length = 0;
+
+    function push(bytes) {
+      chunks.push(bytes);
+      length += bytes.length;
+    }
+
+    function pushHeader(type, size, ...formats) {
+      // formats: [[maxSize, firstByte, numSizeBytes], ...]
+      for (const [maxSize, firstByte, numSizeBytes] of formats) {
+        if (size <= maxSize) {
+          const header = new Uint8Array(1 + numSizeBytes);
+          const view = new DataView(header.buffer);
+          if (numSizeBytes == 0) {
+            header[0] = firstByte | size;
+          } else {
+            header[0] = firstByte;
+            if (numSizeBytes == 1) view.setUint8(1, size);
+            else if (numSizeBytes == 2) view.setUint16(1, size);
+            else view.setUint32(1, size);
+          }
+          push(header);
+          return;
+        }
+      }
+      throw new Error(`${type} too large to encode: ${size}`);
+    }
+
+    function encodeNumber(n) {
+      const bytes = new Uint8Array(9);
+      const view = new DataView(bytes.buffer);
+      if (Number.isInteger(n) && n >= 0 && n <= 0x7f) {
+        push(Uint8Array.of(n));
+      } else if (Number.isInteger(n) && n < 0 && n >= -32) {
+        push(Uint8Array.of(n & 0xff));
+      } else if (Number.isInteger(n) && n >= 0 && n <= 0xffffffff) {
+        bytes[0] = 0xce;
+        view.setUint32(1, n);
+        push(bytes.subarray(0, 5));
+      } else if (Number.isInteger(n) && n < 0 && n >= -0x80000000) {
+        bytes[0] = 0xd2;
+        view.setInt32(1, n);
+        push(bytes.subarray(0, 5));
+      } else if (Number.isInteger(n) && n >= 0 && n < 2 ** 64) {
+        // Larger integers are still integers, not floats, on the Python side.
+        bytes[0] = 0xcf;
+        view.setBigUint64(1, BigInt(n));
+        push(bytes);
+      } else if (Number.isInteger(n) && n < 0 && n >= -(2 ** 63)) {
+        bytes[0] = 0xd3;
+        view.setBigInt64(1, BigInt(n));
+        push(bytes);
+      } else {
+        bytes[0] = 0xcb;
+        view.setFloat64(1, n);
+        push(bytes);
+      }
+    }
+
+    function encodeValue(v) {
+      if (v === null || v === undefined) {
+        push(Uint8Array.of(0xc0));
+      } else if (v === false) {
+        push(Uint8Array.of(0xc2));
+      } else if (v === true) {
+        push(Uint8Array.of(0xc3));
+      } else if (typeof v === "number") {
+        encodeNumber(v);
+      } else if (typeof v === "string") {
+        const bytes = textEncoder.encode(v);
+        pushHeader(
+          "string",
+          bytes.length,
+          [31, 0xa0, 0],
+          [0xff, 0xd9, 1],
+          [0xffff, 0xda, 2],
+          [0xffffffff, 0xdb, 4],
+        );
+        push(bytes);
+      } else if (v instanceof ArrayBuffer || ArrayBuffer.isView(v)) {
+        const bytes = toUint8Array(v);
+        pushHeader(
+          "binary",
+          bytes.length,
+          [0xff, 0xc4, 1],
+          [0xffff, 0xc5, 2],
+          [0xffffffff, 0xc6, 4],
+        );
+        push(bytes);
+      } else if (Array.isArray(v)) {
+        pushHeader(
+          "array",
+          v.length,
+          [15, 0x90, 0],
+          [0xffff, 0xdc, 2],
+          [0xffffffff, 0xdd, 4],
+        );
+        v.forEach(encodeValue);
+      } else if (typeof v === "object") {
+        // Like JSON, skip undefined values.
+        const entries = Object.entries(v).filter(([, x]) => x !== undefined);
+        pushHeader(
+          "map",
+          entries.length,
+          [15, 0x80, 0],
+          [0xffff, 0xde, 2],
+          [0xffffffff, 0xdf, 4],
+        );
+        for (const [k, x] of entries) {
+          encodeValue(k);
+          encodeValue(x);
+        }
+      } else {
+        throw new Error(`can't encode ${typeof v}`);
+      }
+    }
+
+    encodeValue(value);
+    const out = new Uint8Array(length);
+    let offset = 0;
+    for (const chunk of chunks) {
+      out.set(chunk, offset);
+      offset += chunk.length;
+    }
+    return out;
+  }
+
+  function decode(buffer) {
+    const bytes = toUint8Array(buffer);
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let pos = 0;
+
+    function read(n) {
+      if (pos + n > bytes.length) {
+        throw new Error("truncated MessagePack data");
+      }
+      const out = bytes.subarray(pos, pos + n);
+      pos += n;
+      return out;
+    }
+    function readUint(n) {
+      const p = pos;
+      read(n);
+      if (n == 1) return view.getUint8(p);
+      if (n == 2) return view.getUint16(p);
+      if (n == 4) return view.getUint32(p);
+      return Number(view.getBigUint64(p));
+    }
+    function readInt(n) {
+      const p = pos;
+      read(n);
+      if (n == 1) return view.getInt8(p);
+      if (n == 2) return view.getInt16(p);
+      if (n == 4) return view.getInt32(p);
+      return Number(view.getBigInt64(p));
+    }
+    function readArray(n) {
+      const out = new Array(n);
+      for (let i = 0; i < n; i++) out[i] = readValue();
+      return out;
+    }
+    function readMap(n) {
+      const out = {};
+      for (let i = 0; i < n; i++) {
+        const k = readValue();
+        out[k] = readValue();
+      }
+      return out;
+    }
+    function readStr(n) {
+      return textDecoder.decode(read(n));
+    }
+    function readBin(n) {
+      return read(n).slice().buffer;
+    }
+
+    function readValue() {
+      const b = readUint(1);
+      if (b <= 0x7f) return b;
+      if (b <= 0x8f) return readMap(b & 0x0f);
+      if (b <= 0x9f) return readArray(b & 0x0f);
+      if (b <= 0xbf) return readStr(b & 0x1f);
+      if (b >= 0xe0) return b - 0x100;
+      switch (b) {
+        case 0xc0:
+          return null;
+        case 0xc2:
+          return false;
+        case 0xc3:
+          return true;
+        case 0xc4:
+          return readBin(readUint(1));
+        case 0xc5:
+          return readBin(readUint(2));
+        case 0xc6:
+          return readBin(readUint(4));
+        case 0xca: {
+          const p = pos;
+          read(4);
+          return view.getFloat32(p);
+        }
+        case 0xcb: {
+          const p = pos;
+          read(8);
+          return view.getFloat64(p);
+        }
+        case 0xcc:
+          return readUint(1);
+        case 0xcd:
+          return readUint(2);
+        case 0xce:
+          return readUint(4);
+        case 0xcf:
+          return readUint(8);
+        case 0xd0:
+          return readInt(1);
+        case 0xd1:
+          return readInt(2);
+        case 0xd2:
+          return readInt(4);
+        case 0xd3:
+          return readInt(8);
+        case 0xd9:
+          return readStr(readUint(1));
+        case 0xda:
+          return readStr(readUint(2));
+        case 0xdb:
+          return readStr(readUint(4));
+        case 0xdc:
+          return readArray(readUint(2));
+        case 0xdd:
+          return readArray(readUint(4));
+        case 0xde:
+          return readMap(readUint(2));
+        case 0xdf:
+          return readMap(readUint(4));
+        default:
+          // Extension types are not used by python-socketio.
+          throw new Error(`unsupported MessagePack type: 0x${b.toString(16)}`);
+      }
+    }
+
+    const value = readValue();
+    if (pos != bytes.length) {
+      throw new Error("extra bytes after MessagePack data");
+    }
+    return value;
+  }
+
+  class Encoder {
+    encode(packet) {
+      const { type, nsp, data, id } = packet;
+      return [encode({ type, nsp, data, id })];
+    }
+  }
+
+  class Decoder {
+    constructor() {
+      this.listeners = [];
+    }
+    on(event, fn) {
+      if (event == "decoded") this.listeners.push(fn);
+      return this;
+    }
+    off(event, fn) {
+      this.listeners = this.listeners.filter((x) => x !== fn);
+      return this;
+    }
+    add(data) {
+      if (typeof data === "string") {
+        throw new Error("expected binary data");
+      }
+      const packet = decode(data);
+      this.listeners.forEach((fn) => fn(packet));
+    }
+    destroy() {}
+  }
+
+  return { Encoder, Decoder, encode, decode };
+})();
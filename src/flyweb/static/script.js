@@ -1,8 +1,13 @@
 var vdom = null;
+// Last serialized DOM received from the backend. Patches get applied to it.
+var serializedVdom = null;
 // Keep track of server's reported start time and reload the page if it
 // changes, in case any of the static content has changed.
 var server_start_time = null;
-var sio = io();
+// msgpack_parser.js is only loaded if the backend uses MessagePack.
+var sio = io(
+  typeof flywebMsgpackParser !== "undefined" ? { parser: flywebMsgpackParser } : {}
+);
 var projector = maquette.createProjector();
 
 function showError(err) {
@@ -169,25 +174,92 @@ function getMagicalEventHandler(name) {
   }
 }
 
-sio.on("update", (msg) => {
-  let init = vdom === null;
+// Returns false if server has restarted and the page is getting reloaded.
+function checkServerStartTime(msg) {
   if (msg.server_start_time) {
     if (server_start_time !== null && server_start_time != msg.server_start_time) {
       showError("Server has restarted, reloading the page...");
       window.setTimeout(() => window.location.reload(), 1000);
-      // Don't try to update the DOM.
-      return;
+      return false;
     }
     server_start_time = msg.server_start_time;
   }
-  if (msg.vdom) {
-    vdom = toMaquetteDom(msg.vdom);
-    if (init) {
-      projector.append(document.getElementById("flyweb-contents"), () => vdom);
-    } else {
-      projector.scheduleRender();
+  return true;
+}
+
+// Rebuilds Maquette VDOM from serializedVdom and renders it.
+function render() {
+  let init = vdom === null;
+  // toMaquetteDom modifies props in place, so keep serializedVdom pristine
+  // for applying future patches.
+  vdom = toMaquetteDom(structuredClone(serializedVdom));
+  if (init) {
+    projector.append(document.getElementById("flyweb-contents"), () => vdom);
+  } else {
+    projector.scheduleRender();
+  }
+}
+
+function getSerializedNode(path) {
+  let node = serializedVdom;
+  for (const i of path) {
+    node = node[2][i];
+  }
+  return node;
+}
+
+// Applies a patch produced by diff() in _flyweb.py to serializedVdom.
+function applyPatch(patch) {
+  for (const [op, path, ...args] of patch) {
+    switch (op) {
+      case "replace":
+        if (path.length == 0) {
+          serializedVdom = args[0];
+        } else {
+          getSerializedNode(path.slice(0, -1))[2][path.at(-1)] = args[0];
+        }
+        break;
+      case "props":
+        getSerializedNode(path)[1] = args[0];
+        break;
+      case "splice": {
+        const [start, deleteCount, nodes] = args;
+        getSerializedNode(path)[2].splice(start, deleteCount, ...nodes);
+        break;
+      }
+      default:
+        throw new Error(`unsupported patch operation: "${op}"`);
     }
   }
+}
+
+sio.on("update", (msg) => {
+  if (!checkServerStartTime(msg)) {
+    // Don't try to update the DOM.
+    return;
+  }
+  if (msg.vdom) {
+    serializedVdom = msg.vdom;
+    render();
+  }
+  if (msg.title) {
+    document.title = msg.title;
+  }
+});
+
+sio.on("patch", (msg) => {
+  if (!checkServerStartTime(msg)) {
+    return;
+  }
+  // We might get a patch right after (re)connecting, before the full update.
+  // The full update will have the changes.
+  if (serializedVdom === null) {
+    return;
+  }
+  if (msg.patch.length) {
+    applyPatch(msg.patch);
+    render();
+  }
   if (msg.title) {
     document.title = msg.title;
   }
@@ -198,5 +270,8 @@ sio.on("connect", () => {
 });
 
 sio.on("disconnect", () => {
+  // Patches sent while we were disconnected are lost, so ignore any further
+  // patches until the full update that comes after reconnecting.
+  serializedVdom = null;
   document.getElementById("flyweb-disconnected").showModal();
 });
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+import contextlib
+import functools
+import gc
+import json
+import pathlib
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import warnings
+
+import anyio
+import msgpack
+import flyweb
+import portpicker
+import pytest
+import socketio
+from flyweb import _app
+
+
+def _apply_patch(vdom: list, patch: list[list]) -> list:
+    """Applies a patch from _flyweb.diff, like static/script.js does."""
+
+    def node_at(path: list[int]) -> list:
+        node = vdom
+        for i in path:
+            node = node[2][i]
+        return node
+
+    for op, path, *args in patch:
+        if op == "replace":
+            if not path:
+                vdom = args[0]
+            else:
+                node_at(path[:-1])[2][path[-1]] = args[0]
+        elif op == "props":
+            node_at(path)[1] = args[0]
+        elif op == "splice":
+            start, delete_count, nodes = args
+            node_at(path)[2][start : start + delete_count] = nodes
+        else:
+            raise ValueError(f"unknown patch op: {op}")
+    return vdom
+
+
+class _Client:
+    """socket.io client that queues up "update" and "patch" messages."""
+
+    def __init__(self, sio: socketio.AsyncClient, messages):
+        self.sio = sio
+        self._messages = messages
+
+    async def receive(self) -> tuple[str, dict]:
+        with anyio.fail_after(5):
+            return await self._messages.receive()
+
+    async def click(self, target_id: str) -> None:
+        await self.sio.emit("event", {"type": "click", "target_id": target_id})
+
+
+@contextlib.asynccontextmanager
+async def _serve(render_function, **kwargs):
+    """Runs render_function with flyweb.Server, yields the server and its URL."""
+    port = portpicker.pick_unused_port()
+    server = flyweb.Server(render_function, port=port, **kwargs)
+    async with anyio.create_task_group() as tg:
+        await tg.start(server.run)
+        # Server.run returns before hypercorn is listening.
+        with anyio.fail_after(5):
+            while True:
+                try:
+                    stream = await anyio.connect_tcp("localhost", port)
+                except OSError:
+                    await anyio.sleep(0.01)
+                else:
+                    await stream.aclose()
+                    break
+        yield server, f"http://localhost:{port}"
+        tg.cancel_scope.cancel()
+
+
+@contextlib.asynccontextmanager
+async def _connect(url: str, **kwargs):
+    sio = socketio.AsyncClient(**kwargs)
+    send_stream, receive_stream = anyio.create_memory_object_stream(100)
+
+    async def on_message(kind: str, msg: dict) -> None:
+        send_stream.send_nowait((kind, msg))
+
+    sio.on("update", functools.partial(on_message, "update"))
+    sio.on("patch", functools.partial(on_message, "patch"))
+    with send_stream, receive_stream:
+        await sio.connect(url, socketio_path="/socket.io")
+        try:
+            yield _Client(sio, receive_stream)
+        finally:
+            await sio.disconnect()
+
+
+@pytest.mark.anyio
+async def test_update_and_patch():
+    state = {"items": ["a"], "title": "one"}
+
+    def render(w: flyweb.FlyWeb) -> None:
+        w.set_title(state["title"])
+        with w.ul():
+            for item in state["items"]:
+                w.li(item)
+
+    async with _serve(render) as (server, url), _connect(url) as a:
+        kind, msg = await a.receive()
+        assert kind == "update"
+        assert msg["title"] == "one"
+        assert msg["vdom"] == ["div", {}, [["ul", {}, [["li", {}, ["a"]]]]]]
+        vdom = msg["vdom"]
+
+        # A new frontend gets the full DOM, the existing one only a patch.
+        state["items"].append("b")
+        async with _connect(url) as b:
+            kind, msg = await b.receive()
+            assert kind == "update"
+            new_vdom = msg["vdom"]
+            assert new_vdom == [
+                "div",
+                {},
+                [["ul", {}, [["li", {}, ["a"]], ["li", {}, ["b"]]]]],
+            ]
+
+            kind, msg = await a.receive()
+            assert kind == "patch"
+            assert msg["patch"] == [["splice", [0], 1, 0, [["li", {}, ["b"]]]]]
+            vdom = _apply_patch(vdom, msg["patch"])
+            assert vdom == new_vdom
+
+            # Nothing changed, so nothing gets sent.
+            await server.update()
+            # Title changes get sent even if the DOM didn't change.
+            state["title"] = "two"
+            await server.update()
+            for client in (a, b):
+                kind, msg = await client.receive()
+                assert kind == "patch"
+                assert msg == {
+                    "patch": [],
+                    "title": "two",
+                    "server_start_time": msg["server_start_time"],
+                }
+
+
+@pytest.mark.anyio
+async def test_update_debounce():
+    state = {"n": 0, "renders": 0}
+
+    def render(w: flyweb.FlyWeb) -> None:
+        state["renders"] += 1
+        w.text(str(state["n"]))
+
+    debounce_s = 0.2
+    async with _serve(render, update_debounce_s=debounce_s) as (server, url):
+        async with _connect(url) as client:
+            await client.receive()
+            assert state["renders"] == 1
+
+            # Requests spread out over the debounce window result in a single
+            # render.
+            for _ in range(5):
+                state["n"] += 1
+                server.schedule_update()
+                await anyio.sleep(debounce_s / 10)
+            kind, msg = await client.receive()
+            assert kind == "patch"
+            assert msg["patch"] == [["replace", [0], "5"]]
+            await anyio.sleep(debounce_s * 2)
+            assert state["renders"] == 2
+
+
+@pytest.mark.anyio
+async def test_context_cleans_up():
+    app = flyweb.App("/", lambda _: None)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        async with app:
+            pass
+        gc.collect()
+    assert [w.message for w in caught if w.category is ResourceWarning] == []
+
+
+@pytest.mark.anyio
+async def test_binary():
+    state = {"n": 0}
+
+    def on_click(_: flyweb.MouseEvent) -> None:
+        state["n"] += 1
+
+    def render(w: flyweb.FlyWeb) -> None:
+        w.text(str(state["n"]))
+        w.button("+", id="inc", onclick=on_click)
+
+    async with _serve(render, binary=True) as (_, url):
+        async with _connect(url, serializer="msgpack") as client:
+            kind, msg = await client.receive()
+            assert kind == "update"
+            assert msg["vdom"] == [
+                "div",
+                {},
+                [
+                    "0",
+                    [
+                        "button",
+                        {
+                            "id": "inc",
+                            "onclick": ["_flyweb_event_handler", "mouse_event"],
+                        },
+                        ["+"],
+                    ],
+                ],
+            ]
+            await client.click("inc")
+            kind, msg = await client.receive()
+            assert kind == "patch"
+            assert msg["patch"] == [["replace", [0], "1"]]
+
+
+# Runs static/msgpack_parser.js. Reads {"values": [...], "packed": [...]} from
+# stdin, where "packed" are hex-encoded MessagePack messages. Writes out
+# "values" encoded to hex and "packed" decoded to JSON.
+_MSGPACK_PARSER_SCRIPT = """
+const fs = require("fs");
+const vm = require("vm");
+vm.runInThisContext(fs.readFileSync(process.argv[1], "utf8"));
+const parser = flywebMsgpackParser;
+const input = JSON.parse(fs.readFileSync(0, "utf8"));
+const hex = (bytes) => Buffer.from(bytes).toString("hex");
+process.stdout.write(JSON.stringify({
+  encoded: input.values.map((v) => hex(parser.encode(v))),
+  decoded: input.packed.map((h) => parser.decode(Buffer.from(h, "hex"))),
+  packet: hex(new parser.Encoder().encode(input.packet)[0]),
+}));
+"""
+
+_MSGPACK_VALUES = [
+    None,
+    True,
+    False,
+    0,
+    127,
+    128,
+    255,
+    65536,
+    2**32 - 1,
+    2**32,
+    2**53 - 1,
+    -1,
+    -32,
+    -33,
+    -(2**31),
+    -(2**31) - 1,
+    -(2**53 - 1),
+    1.5,
+    "",
+    "a" * 31,
+    "b" * 32,
+    "\u00fc" * 200,
+    "c" * 70000,
+    [],
+    list(range(16)),
+    list(range(70000)),
+    {},
+    {str(i): i for i in range(16)},
+    ["div", {"class": "a"}, ["x", ["span", {}, []]]],
+]
+
+
+@pytest.mark.skipif(not shutil.which("node"), reason="needs node")
+def test_msgpack_parser():
+    path = pathlib.Path(flyweb.__file__).parent / "static/msgpack_parser.js"
+    packet = {"type": 2, "nsp": "/", "data": ["event", {"type": "click"}]}
+    result = subprocess.run(
+        ["node", "-e", _MSGPACK_PARSER_SCRIPT, str(path)],
+        input=json.dumps(
+            {
+                "values": _MSGPACK_VALUES,
+                "packed": [msgpack.packb(v).hex() for v in _MSGPACK_VALUES],
+                "packet": packet,
+            }
+        ),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    output = json.loads(result.stdout)
+    encoded = [
+        msgpack.unpackb(bytes.fromhex(h), strict_map_key=False)
+        for h in output["encoded"]
+    ]
+    assert encoded == _MSGPACK_VALUES
+    # Integers must not turn into floats (or vice versa), which == ignores.
+    assert [type(v) for v in encoded] == [type(v) for v in _MSGPACK_VALUES]
+    assert output["decoded"] == _MSGPACK_VALUES
+    assert msgpack.unpackb(bytes.fromhex(output["packet"])) == packet
+
+
+@pytest.mark.anyio
+async def test_update_without_frontends():
+    renders = []
+    app = flyweb.App("/", renders.append)
+    async with app:
+        # Scheduled updates are skipped while nobody is connected...
+        app.schedule_update()
+        await anyio.sleep(0.05)
+        assert renders == []
+        # ...but update() always renders.
+        await app.update()
+        assert len(renders) == 1
+
+
+@pytest.mark.anyio
+async def test_update_outside_context():
+    app = flyweb.App("/", lambda _: None)
+    with pytest.raises(RuntimeError, match="you must enter App's async context"):
+        await app.update()
+
+
+@pytest.mark.anyio
+async def test_schedule_update_while_exiting():
+    app = flyweb.App("/", lambda _: None)
+
+    async def schedule_updates():
+        while True:
+            app.schedule_update()
+            await anyio.sleep(0)
+
+    async with anyio.create_task_group() as tg:
+        async with app:
+            tg.start_soon(schedule_updates)
+            await anyio.sleep(0.01)
+        await anyio.sleep(0.01)
+        tg.cancel_scope.cancel()
+
+
+def test_flyweb_static_dir_extracted_once(monkeypatch, tmp_path):
+    # Pretend that flyweb is installed in a zip file, so that the static files
+    # have to be extracted.
+    extracted = []
+
+    @contextlib.contextmanager
+    def as_file(_):
+        extracted.append(tmp_path)
+        time.sleep(0.1)
+        yield tmp_path
+
+    class Traversable:
+        def joinpath(self, _):
+            return self
+
+    monkeypatch.setattr(_app.resources, "files", lambda _: Traversable())
+    monkeypatch.setattr(_app.resources, "as_file", as_file)
+    monkeypatch.setattr(_app.atexit, "register", lambda *_: None)
+    _app._find_flyweb_static_dir.cache_clear()
+    try:
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(_app._get_flyweb_static_dir())
+            )
+            for _ in range(2)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        _app._find_flyweb_static_dir.cache_clear()
+    assert results == [tmp_path, tmp_path]
+    assert extracted == [tmp_path]
+
+
+if __name__ == "__main__":
+    pytest.main(sys.argv)
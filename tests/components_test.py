@@ -39,7 +39,7 @@ def test_textinput():
                 "input",
                 {
                     "id": "flyweb/input",
-                    "onblur": ["_flyweb_event_handler", "focus_event"],
+                    "onblur": ("_flyweb_event_handler", "focus_event"),
                     "value": "",
                 },
                 [],
@@ -48,7 +48,7 @@ def test_textinput():
                 "input",
                 {
                     "id": "flyweb/input[1]",
-                    "onblur": ["_flyweb_event_handler", "focus_event"],
+                    "onblur": ("_flyweb_event_handler", "focus_event"),
                     "value": "foo",
                 },
                 [],
@@ -58,20 +58,20 @@ def test_textinput():
                 {
                     "_flyweb": {
                         "individualKeyDownHandlers": {
-                            "a": [
+                            "a": (
                                 "_flyweb_event_handler",
                                 "keyboard_event",
                                 "flyweb/input[2]/_flyweb/individualKeyDownHandlers/a",
-                            ],
-                            "b": [
+                            ),
+                            "b": (
                                 "_flyweb_event_handler",
                                 "keyboard_event",
                                 "flyweb/input[2]/_flyweb/individualKeyDownHandlers/b",
-                            ],
+                            ),
                         }
                     },
                     "id": "flyweb/input[2]",
-                    "onblur": ["_flyweb_event_handler", "focus_event"],
+                    "onblur": ("_flyweb_event_handler", "focus_event"),
                     "value": "",
                 },
                 [],
@@ -81,20 +81,20 @@ def test_textinput():
                 {
                     "_flyweb": {
                         "individualKeyDownHandlers": {
-                            "Enter": [
+                            "Enter": (
                                 "_flyweb_event_handler",
                                 "keyboard_event",
                                 "flyweb/input[3]/_flyweb/individualKeyDownHandlers/Enter",  # noqa
-                            ],
-                            "Escape": [
+                            ),
+                            "Escape": (
                                 "_flyweb_event_handler",
                                 "keyboard_event",
                                 "flyweb/input[3]/_flyweb/individualKeyDownHandlers/Escape",  # noqa
-                            ],
+                            ),
                         }
                     },
                     "id": "flyweb/input[3]",
-                    "onblur": ["_flyweb_event_handler", "focus_event"],
+                    "onblur": ("_flyweb_event_handler", "focus_event"),
                     "value": "",
                 },
                 [],
@@ -103,6 +103,27 @@ def test_textinput():
     ]
 
 
+def test_textinput_individual_key_handlers():
+    entered = []
+    w = flyweb.FlyWeb()
+    text_input = components.TextInput(on_enter=entered.append, clear_on_escape=True)
+    w.add(text_input)
+    flyweb.serialize(w)
+
+    prefix = "flyweb/input/_flyweb/individualKeyDownHandlers/"
+    for key, value in [("Escape", "a"), ("Enter", "b")]:
+        event = {
+            "_flyweb_handler_key": prefix + key,
+            "type": "keydown",
+            "target_id": "flyweb/input",
+            "target_value": value,
+            "key": key,
+        }
+        assert w._handle_event_from_frontend(event)
+    assert entered == ["b"]
+    assert text_input.value == ""
+
+
 def test_checkbox():
     w = flyweb.FlyWeb()
     w.add(components.CheckBox())
@@ -119,7 +140,7 @@ def test_checkbox():
                     "type": "checkbox",
                     "checked": False,
                     "id": "flyweb/input[checkbox]",
-                    "onclick": ["_flyweb_event_handler", "mouse_event"],
+                    "onclick": ("_flyweb_event_handler", "mouse_event"),
                 },
                 [],
             ],
@@ -129,7 +150,7 @@ def test_checkbox():
                     "type": "checkbox",
                     "checked": True,
                     "id": "flyweb/input[checkbox][1]",
-                    "onclick": ["_flyweb_event_handler", "mouse_event"],
+                    "onclick": ("_flyweb_event_handler", "mouse_event"),
                 },
                 [],
             ],
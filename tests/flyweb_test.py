@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import functools
+import json
 import sys
 
 import flyweb
@@ -29,7 +31,7 @@ def test_basic_rendering():
                     [
                         "button",
                         {
-                            "onclick": ["_flyweb_event_handler", "event"],
+                            "onclick": ("_flyweb_event_handler", "event"),
                             "id": "flyweb/div/button",
                         },
                         ["b"],
@@ -37,7 +39,7 @@ def test_basic_rendering():
                     [
                         "button",
                         {
-                            "onclick": ["_flyweb_event_handler", "event"],
+                            "onclick": ("_flyweb_event_handler", "event"),
                             "id": "flyweb/div/button[1]",
                         },
                         ["b2"],
@@ -50,5 +52,96 @@ def test_basic_rendering():
     ]
 
 
+def test_serialize_to_json():
+    w = flyweb.FlyWeb()
+    with w.div(class_="a", styles={"color": "red"}):
+        w.button("b", onclick=_onclick)
+        w.text("c")
+    assert json.loads(flyweb.serialize_to_json(w)) == json.loads(
+        json.dumps(flyweb.serialize(w))
+    )
+
+
+def test_serialize_dom_node_subclass():
+    class Node(flyweb._flyweb.DomNode):
+        pass
+
+    w = flyweb.FlyWeb()
+    w.div(Node(tag="span", children=["x", Node(tag="b")]), "y")
+    expected = ["div", {}, [["div", {}, [["span", {}, ["x", ["b", {}, []]]], "y"]]]]
+    assert flyweb.serialize(w) == expected
+    assert json.loads(json.dumps(flyweb.serialize(w))) == expected
+    assert json.loads(flyweb.serialize_to_json(w)) == expected
+
+
+def test_reset():
+    w = flyweb.FlyWeb()
+    w.set_title("t")
+    w.button("b", onclick=_onclick)
+    first = flyweb.serialize(w)
+    w.reset()
+    assert flyweb.serialize(w) == ["div", {}, []]
+    assert w._title is None
+    assert not w._event_handlers
+    w.button("b", onclick=_onclick)
+    assert flyweb.serialize(w) == first
+
+
+def test_decorated_handler_annotations():
+    # Wrappers share code, so their annotations must not be cached by code.
+    def wrap(f):
+        @functools.wraps(f)
+        def wrapper(*args):
+            return f(*args)
+
+        return wrapper
+
+    @wrap
+    def on_key(_: flyweb.KeyboardEvent) -> None:
+        pass
+
+    @wrap
+    def on_mouse(_: flyweb.MouseEvent) -> None:
+        pass
+
+    w = flyweb.FlyWeb()
+    w.div(onkeydown=on_key, onmousedown=on_mouse)
+    [[_, props, _]] = flyweb.serialize(w)[2]
+    assert props["onkeydown"] == ("_flyweb_event_handler", "keyboard_event")
+    assert props["onmousedown"] == ("_flyweb_event_handler", "mouse_event")
+
+
+def test_diff():
+    old = [
+        "div",
+        {},
+        [["span", {"class": "a"}, ["x"]], "y", ["ul", {}, [["li", {}, ["1"]]]]],
+    ]
+    new = [
+        "div",
+        {},
+        [
+            ["span", {"class": "b"}, ["x"]],
+            "y",
+            ["ul", {}, [["li", {}, ["1"]], ["li", {}, ["2"]]]],
+            "z",
+        ],
+    ]
+    assert flyweb._flyweb.diff(old, old) == []
+    assert flyweb._flyweb.diff(old, new) == [
+        ["props", [0], {"class": "b"}],
+        ["splice", [2], 1, 0, [["li", {}, ["2"]]]],
+        ["splice", [], 3, 0, ["z"]],
+    ]
+    assert flyweb._flyweb.diff(new, old) == [
+        ["props", [0], {"class": "a"}],
+        ["splice", [2], 1, 1, []],
+        ["splice", [], 3, 1, []],
+    ]
+    assert flyweb._flyweb.diff(["div", {}, ["a"]], ["div", {}, [["b", {}, []]]]) == [
+        ["replace", [0], ["b", {}, []]]
+    ]
+
+
 if __name__ == "__main__":
     pytest.main(sys.argv)
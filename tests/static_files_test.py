@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import sys
+
+import pytest
+from flyweb import _static_files
+
+
+async def _passed_on_app(scope, receive, send):
+    await send({"type": "passed_on", "path": scope["path"]})
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    (tmp_path / "index.html").write_bytes(b"<html></html>")
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "a.css").write_bytes(b"a {}")
+    # Larger than a single chunk.
+    (static / "big.js").write_bytes(bytes(range(256)) * 600)
+    # Only reachable through "/" if socket.io paths weren't excluded.
+    (tmp_path / "socket.io").mkdir()
+    (tmp_path / "socket.io" / "index.html").write_bytes(b"nope")
+    return _static_files.StaticFilesApp(
+        _passed_on_app,
+        static_files={"/": f"{tmp_path}/", "/static": str(static)},
+        socketio_path="/socket.io",
+    )
+
+
+async def _request(app, path: str, *, method="GET", extensions=None) -> list[dict]:
+    scope = {"type": "http", "method": method, "path": path}
+    if extensions is not None:
+        scope["extensions"] = extensions
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+def _headers(start: dict) -> dict[bytes, bytes]:
+    assert start["type"] == "http.response.start"
+    assert start["status"] == 200
+    return dict(start["headers"])
+
+
+@pytest.mark.anyio
+async def test_pathsend(static_app, tmp_path):
+    start, body = await _request(
+        static_app, "/static/a.css", extensions={"http.response.pathsend": {}}
+    )
+    assert _headers(start) == {b"Content-Type": b"text/css", b"Content-Length": b"4"}
+    assert body == {
+        "type": "http.response.pathsend",
+        "path": str(tmp_path / "static" / "a.css"),
+    }
+
+
+@pytest.mark.anyio
+async def test_zerocopysend(static_app, tmp_path):
+    start, body = await _request(
+        static_app, "/static/a.css", extensions={"http.response.zerocopysend": {}}
+    )
+    assert _headers(start)[b"Content-Length"] == b"4"
+    assert body["type"] == "http.response.zerocopysend"
+    assert body["file"].name == str(tmp_path / "static" / "a.css")
+
+
+@pytest.mark.anyio
+async def test_chunked(static_app, tmp_path):
+    start, *bodies = await _request(static_app, "/")
+    assert _headers(start) == {
+        b"Content-Type": b"text/html",
+        b"Content-Length": b"13",
+    }
+    assert bodies == [
+        {"type": "http.response.body", "body": b"<html></html>", "more_body": False}
+    ]
+
+    contents = (tmp_path / "static" / "big.js").read_bytes()
+    assert len(contents) > 2 * _static_files._CHUNK_SIZE
+    start, *bodies = await _request(static_app, "/static/big.js")
+    assert _headers(start)[b"Content-Length"] == str(len(contents)).encode()
+    assert [len(b["body"]) for b in bodies] == [
+        _static_files._CHUNK_SIZE,
+        _static_files._CHUNK_SIZE,
+        len(contents) - 2 * _static_files._CHUNK_SIZE,
+    ]
+    assert [b["more_body"] for b in bodies] == [True, True, False]
+    assert b"".join(b["body"] for b in bodies) == contents
+
+
+@pytest.mark.anyio
+async def test_head(static_app):
+    for extensions in (None, {"http.response.pathsend": {}}):
+        start, body = await _request(
+            static_app, "/static/a.css", method="HEAD", extensions=extensions
+        )
+        assert _headers(start)[b"Content-Length"] == b"4"
+        assert body == {"type": "http.response.body", "body": b""}
+
+
+@pytest.mark.anyio
+async def test_passed_on(static_app):
+    for path in ["/static/missing.css", "/static", "/socket.io/", "/socket.io"]:
+        assert await _request(static_app, path) == [{"type": "passed_on", "path": path}]
+
+
+if __name__ == "__main__":
+    pytest.main(sys.argv)